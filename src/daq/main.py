@@ -61,6 +61,7 @@ class MainWindowGUI(*uic.loadUiType("main.ui")):
         self.actionreconnect.triggered.connect(self.ses_shortcuts.reconnect)
         self.actionworkfile.triggered.connect(self.scantype.show_workfile_viewer)
         self.actionfixfiles.triggered.connect(self.scantype.fix_files)
+        self.actionrefreshlimits.triggered.connect(self.scantype.refresh_motor_limits)
 
     def closeEvent(self, event: QtGui.QCloseEvent):
         threadpool = QtCore.QThreadPool.globalInstance()
@@ -1,11 +1,11 @@
 import csv
 import datetime
-import glob
 import logging
 import os
 import shutil
 import sys
 import tempfile
+import threading
 import time
 import zipfile
 from collections import deque
@@ -14,19 +14,18 @@ from multiprocessing import shared_memory
 
 import numpy as np
 import numpy.typing as npt
-import pywinauto
-import pywinauto.win32functions
 import win32.lib.pywintypes
+import win32con
+import win32event
+import win32file
 from qtpy import QtCore
 
 from sescontrol.plugins import Motor
-from sescontrol.ses_win import get_ses_properties
+from sescontrol.ses_win import SESController
+from sescontrol.utils import TEMPFILE_PREFIX, backoff_sleep, restore_names
 
 log = logging.getLogger("scan")
 
-TEMPFILE_PREFIX: str = "_tmp_"  #: Prefix to use for working files
-
-
 """
 Limitations
 
@@ -62,98 +61,146 @@ def gen_data_name(
     return fname
 
 
-def restore_names(extensions: list[str], directory: str, basename: str):
-    # Get all mangled files
-    files: list[str] = []
-    for ext in [*extensions, ".csv"]:
-        files += glob.glob(
-            os.path.join(directory, f"{TEMPFILE_PREFIX}{basename}*{ext}")
-        )
-    for f in files:
-        new = f.replace(
-            os.path.basename(f), os.path.basename(f).replace(TEMPFILE_PREFIX, "")
-        )
-        while True:
-            try:
-                os.rename(f, new)
-            except PermissionError:
-                time.sleep(0.001)
-                continue
-            except FileExistsError:
-                if f.endswith(".csv"):
-                    with open(f, newline="") as source_csv:
-                        source_reader = csv.reader(source_csv)
-                        with open(new, "a", newline="") as dest_csv:
-                            dest_writer = csv.writer(dest_csv)
-                            for row in source_reader:
-                                dest_writer.writerow(row)
-                    os.remove(f)
-                break
-            else:
-                break
+class MotorPosWriter(QtCore.QThread):
+    """Thread that appends motor positions to the log file of the current scan.
 
+    The writer lives for the lifetime of the scan window in its own thread rather than
+    occupying a slot of the global thread pool, which is used by the scan workers.
+    """
 
-class MotorPosWriter(QtCore.QRunnable):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, parent: QtCore.QObject | None = None):
+        super().__init__(parent)
         self._stopped: bool = False
         self.messages: deque[list[str]] = deque()
         self.fname: str | None = None
         self.fname_prefixed: str | None = None
 
+        # Log file kept open while entries are coming in
+        self._fh = None
+        self._writer = None
+        # Whether the file without prefix exists, i.e., the scan has finished
+        self._bare_exists: bool = False
+
+        # Guards `messages` and the open file; the condition is signaled when an entry
+        # is added or when the writer is stopped
+        self._mutex = QtCore.QMutex()
+        self._cond = QtCore.QWaitCondition()
+
+    def _close_file(self, sync: bool = False):
+        if self._fh is not None:
+            if sync:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+            self._fh.close()
+            self._fh = None
+            self._writer = None
+
+    def _write_pending(self):
+        """Write all pending messages to the log file."""
+        if self._fh is None:
+            # if file without prefix exists, the scan has finished but we have
+            # remaining log entries to enter. An open file cannot be renamed on
+            # Windows, so this only needs to be checked when opening.
+            if not self._bare_exists:
+                self._bare_exists = os.path.isfile(self.fname)
+            fname = self.fname if self._bare_exists else self.fname_prefixed
+
+            # Line buffered, so every row reaches the OS as soon as it is written
+            self._fh = open(fname, "a", buffering=1, newline="")
+            self._writer = csv.writer(self._fh)
+
+        self._writer.writerows(self.messages)
+        self.messages.clear()
+
     def run(self):
         self._stopped = False
         while not self._stopped:
-            time.sleep(0.02)
-            if len(self.messages) == 0:
-                continue
-            msg = self.messages.popleft()
+            locked: bool = False
+            self._mutex.lock()
             try:
-                # if file without prefix exists, the scan has finished but we have
-                # remaining log entries to enter.
-                if os.path.isfile(self.fname):
-                    fname = self.fname
-                else:
-                    fname = self.fname_prefixed
-
-                with open(fname, "a", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(msg)
-
-            except PermissionError:
-                self.messages.appendleft(msg)
-                continue
+                if len(self.messages) == 0:
+                    self._cond.wait(self._mutex, 1000)
+                if len(self.messages) == 0:
+                    # Idle, release the file. On Windows, the file cannot be renamed
+                    # while it is open, which is done when the scan finishes.
+                    self._close_file()
+                    continue
+                try:
+                    self._write_pending()
+                except PermissionError:
+                    self._close_file()
+                    locked = True
+            finally:
+                self._mutex.unlock()
+            if locked:
+                # Retry shortly instead of spinning while the file is locked
+                time.sleep(0.02)
+
+        self._mutex.lock()
+        self._close_file(sync=True)
+        self._mutex.unlock()
 
     def stop(self):
-        n_left = len(self.messages)
-        if n_left != 0:
-            print(
-                f"Failed to write {n_left} " + ("entries:" if n_left > 1 else "entry:")
-            )
-            for msg in self.messages:
-                print(",".join(msg))
-        self._stopped = True
+        self._mutex.lock()
+        try:
+            if len(self.messages) != 0 and self.fname is not None:
+                # Write remaining entries now instead of waiting for the writer thread
+                try:
+                    self._write_pending()
+                except OSError:
+                    self._close_file()
+            n_left = len(self.messages)
+            if n_left != 0:
+                print(
+                    f"Failed to write {n_left} "
+                    + ("entries:" if n_left > 1 else "entry:")
+                )
+                for msg in self.messages:
+                    print(",".join(msg))
+            self._stopped = True
+            self._cond.wakeAll()
+        finally:
+            self._mutex.unlock()
 
     def set_file(self, dirname: str | os.PathLike, base_file: str, data_idx: int):
-        self.fname = os.path.join(
-            dirname,
-            gen_data_name(base_file, data_idx, prefix=False, motor=True, ext=".csv"),
-        )
-        self.fname_prefixed = os.path.join(
-            dirname,
-            gen_data_name(base_file, data_idx, prefix=True, motor=True, ext=".csv"),
-        )
+        self._mutex.lock()
+        try:
+            self._close_file()
+            self._bare_exists = False
+            self.fname = os.path.join(
+                dirname,
+                gen_data_name(
+                    base_file, data_idx, prefix=False, motor=True, ext=".csv"
+                ),
+            )
+            self.fname_prefixed = os.path.join(
+                dirname,
+                gen_data_name(base_file, data_idx, prefix=True, motor=True, ext=".csv"),
+            )
+        finally:
+            self._mutex.unlock()
 
     def write_pos(self, content: str | list[str]):
         """Append content to log file."""
         if isinstance(content, str):
             content = [content]
+        self._mutex.lock()
         self.messages.append(content)
+        self._cond.wakeOne()
+        self._mutex.unlock()
+
+    def enqueue_point(self, niter: int, pos: Sequence[float]):
+        """Append a log entry for a finished motor point.
+
+        This is connected directly to the worker signal, so it is called from the scan
+        worker thread.
+        """
+        self.write_pos([str(niter), *map(str, pos)])
 
     def write_header(self, header: str | list[str]):
-        """Create and append a header to log file.
+        """Create the log file and write a header to it.
 
-        If a file with the same name already exists, it will be removed.
+        If a file with the same name already exists, it will be overwritten.
 
         Parameters
         ----------
@@ -161,11 +208,18 @@ class MotorPosWriter(QtCore.QRunnable):
             Header content to write to file.
 
         """
-        if os.path.isfile(self.fname_prefixed):
-            log.info(f"Log file {self.fname_prefixed} already exists, overwriting")
-            os.remove(self.fname_prefixed)
-
-        self.write_pos(header)
+        if isinstance(header, str):
+            header = [header]
+        self._mutex.lock()
+        try:
+            # The writer may still hold a file of the same name from a previous scan
+            self._close_file()
+            if os.path.isfile(self.fname_prefixed):
+                log.info(f"Log file {self.fname_prefixed} already exists, overwriting")
+            with open(self.fname_prefixed, "w", newline="") as f:
+                csv.writer(f).writerow(header)
+        finally:
+            self._mutex.unlock()
 
 
 class ScanWorkerSignals(QtCore.QObject):
@@ -184,26 +238,43 @@ class ScanWorker(QtCore.QRunnable):
         data_idx: int,
         valid_ext: Iterable[str],
         has_da: bool,
+        ses: SESController | None = None,
     ):
         super().__init__()
 
         self.motors: list[Motor] = [Motor.plugins[k]() for k in motors]
-        self.array: npt.NDArray[np.float64] = motion_array
+        self.array: npt.NDArray[np.float64] = np.ascontiguousarray(
+            motion_array, dtype=np.float64
+        )
         self.base_dir: str = base_dir
         self.base_file: str = base_file
         self.data_idx: int = data_idx
-        self.valid_ext: Iterable[str] = valid_ext
+        self.valid_ext: tuple[str, ...] = tuple(valid_ext)
         self.has_da: bool = has_da
 
-        self.signals = ScanWorkerSignals()
-        self._pid, self._hwnd = get_ses_properties()
-        self._ses_app = pywinauto.Application(backend="win32").connect(
-            process=self._pid
+        # Paths of the files SES writes for each step, one for each extension
+        data_stem: str = os.path.join(self.base_dir, self.data_name)
+        self._data_paths: tuple[str, ...] = tuple(
+            data_stem + ext for ext in self.valid_ext
         )
+
+        self.signals = ScanWorkerSignals()
+
+        # Reuse the existing connection instead of looking up SES again. Menu items are
+        # resolved and cached by the controller.
+        if ses is None:
+            ses = SESController()
+        elif not ses.alive:
+            ses.try_connect()
+        if not ses.alive:
+            raise RuntimeError("SES is not running")
+        self._ses: SESController = ses
         self.n_complete: int = 0
 
         self._stop: bool = False
         self._stopnow: bool = False
+        # Set together with `_stopnow` to interrupt waits in `sequence_run_wait`
+        self._stopnow_event = threading.Event()
 
     @property
     def data_name(self) -> str:
@@ -211,29 +282,17 @@ class ScanWorker(QtCore.QRunnable):
 
     def check_finished(self) -> bool:
         """Return whether if sequence is finished."""
-        path = (
-            self._ses_app.window(handle=self._hwnd)
-            .menu()
-            .get_menu_path("Sequence->Run")
-        )
-        return path[-1].is_enabled()
+        return self._ses.is_enabled("Sequence->Run")
 
     def click_sequence_button(self, button: str):
         """Click a button in the Sequence menu."""
+        dt: float = 0.01
         while True:
             try:
-                path = (
-                    self._ses_app.window(handle=self._hwnd)
-                    .menu()
-                    .get_menu_path(f"Sequence->{button}")
-                )
-                if path[-1].is_enabled():
-                    path[-1].ctrl.send_message(
-                        path[-1].menu.COMMAND, path[-1].item_id()
-                    )
-                    pywinauto.win32functions.WaitGuiThreadIdle(path[-1].ctrl.handle)
-            except win32.lib.pywintypes.error:
+                self._ses.command_menu(f"Sequence->{button}")
+            except (OSError, win32.lib.pywintypes.error):
                 log.exception(f"Error while clicking sequence button {button}")
+                dt = backoff_sleep(dt)
                 continue
             else:
                 break
@@ -250,6 +309,7 @@ class ScanWorker(QtCore.QRunnable):
         """Force stop now."""
         self._stop = True
         self._stopnow = True
+        self._stopnow_event.set()
 
     def update_seq_start_time(self):
         """Write current time to shared memory if exists.
@@ -283,6 +343,7 @@ class ScanWorker(QtCore.QRunnable):
 
         # Keep checking for abort during scan
         aborted: bool = False
+        dt: float = 0.005
         while True:
             if (not aborted) and self._stopnow:
                 log.debug("Clicking force stop")
@@ -291,18 +352,80 @@ class ScanWorker(QtCore.QRunnable):
             if self.check_finished():
                 log.debug("Sequence finished")
                 break
-            time.sleep(0.001)
+            if aborted:
+                dt = backoff_sleep(dt)
+            else:
+                # Wake up early to send the abort command when force stopped
+                self._stopnow_event.wait(dt)
+                dt = min(dt * 1.5, 0.1)
 
         if self.has_da:
-            # DA maps take time to save even after scan ends
-            # Waits and checks frequently until the zip file seems intact
-            log.debug("Checking if the DA map is completely saved")
-            timeout_start = time.perf_counter()
-            fname = os.path.join(self.base_dir, f"{self.data_name}.zip")
-            time.sleep(0.2)
+            self._wait_da_saved()
+
+        if aborted:
+            return False
+        else:
+            self.n_complete += 1
+            return True
+
+    def _wait_da_saved(self):
+        """Wait until the DA map of the current step is completely saved.
+
+        DA maps take time to save even after the sequence ends. Instead of polling at a
+        fixed interval, the data directory is watched for changes. The zip file is only
+        copied and test-opened once its size and modification time have not changed for
+        a while, since copying a file that SES is still writing is expensive for large
+        maps.
+        """
+        log.debug("Checking if the DA map is completely saved")
+        timeout_start = time.perf_counter()
+        fname = os.path.join(self.base_dir, f"{self.data_name}.zip")
+
+        # Time in seconds the file must stay unchanged before trying to open it
+        settle: float = 0.5
+        # Minimum time in seconds between two attempts to open the file
+        min_interval: float = 1.0
+
+        # (size, mtime) of the file and the time it was first seen with those values
+        last_key: tuple[int, int] | None = None
+        last_key_since: float = timeout_start
+        # (size, mtime) of the last copy that failed to open
+        last_bad: tuple[int, int] | None = None
+        last_attempt: float = -float("inf")
+
+        change = win32file.FindFirstChangeNotification(
+            self.base_dir,
+            False,
+            win32con.FILE_NOTIFY_CHANGE_FILE_NAME
+            | win32con.FILE_NOTIFY_CHANGE_SIZE
+            | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE,
+        )
+        try:
             while True:
-                time.sleep(0.2)
-                if os.path.isfile(fname) and os.stat(fname).st_size != 0:
+                # Returns early when the directory changes
+                if (
+                    win32event.WaitForSingleObject(change, 200)
+                    == win32event.WAIT_OBJECT_0
+                ):
+                    win32file.FindNextChangeNotification(change)
+                now = time.perf_counter()
+                try:
+                    stat = os.stat(fname)
+                except FileNotFoundError:
+                    stat = None
+                if stat is not None and stat.st_size != 0:
+                    key = (stat.st_size, stat.st_mtime_ns)
+                    if key != last_key:
+                        # Still being written
+                        last_key, last_key_since = key, now
+                        continue
+                    if (
+                        key == last_bad
+                        or now - last_key_since < settle
+                        or now - last_attempt < min_interval
+                    ):
+                        continue
+                    last_attempt = now
                     try:
                         # Copy the zipfile and try opening
                         with tempfile.TemporaryDirectory() as tmpdirname:
@@ -311,6 +434,7 @@ class ScanWorker(QtCore.QRunnable):
                                 # Do nothing, just trying to open the file
                                 pass
                     except zipfile.BadZipFile:
+                        last_bad = key
                         continue
                     else:
                         log.debug("DA map file appears to be intact")
@@ -321,12 +445,8 @@ class ScanWorker(QtCore.QRunnable):
                     # the measurement, the DA map might never be saved, so we wait 30s
                     # and assume everything is OK
                     break
-
-        if aborted:
-            return False
-        else:
-            self.n_complete += 1
-            return True
+        finally:
+            win32file.FindCloseChangeNotification(change)
 
     def run(self):
         if len(self.motors) == 0:
@@ -343,8 +463,9 @@ class ScanWorker(QtCore.QRunnable):
                 log.debug(f"Pre-motion for axis {i + 1} complete, checking bounds")
 
                 # Last sanity check of bounds before motion start
-                if (ax.minimum is not None and min(self.array[:, i]) < ax.minimum) or (
-                    ax.maximum is not None and max(self.array[:, i]) > ax.maximum
+                coord = self.array[:, i]
+                if (ax.minimum is not None and coord.min() < ax.minimum) or (
+                    ax.maximum is not None and coord.max() > ax.maximum
                 ):
                     ax.post_motion()
                     self.signals.sigFinished.emit()
@@ -380,21 +501,19 @@ class ScanWorker(QtCore.QRunnable):
             Index of the scan to rename.
 
         """
-        for ext in self.valid_ext:
-            f = os.path.join(self.base_dir, f"{self.data_name}{ext}")
-
-            new = os.path.join(
-                self.base_dir,
-                gen_data_name(
-                    self.base_file, self.data_idx, slice_idx=index, prefix=True, ext=ext
-                ),
-            )
+        new_stem: str = os.path.join(
+            self.base_dir,
+            gen_data_name(self.base_file, self.data_idx, slice_idx=index, prefix=True),
+        )
+        for f, ext in zip(self._data_paths, self.valid_ext, strict=True):
+            new = new_stem + ext
             if os.path.isfile(f):
+                dt: float = 0.001
                 while True:
                     try:
                         os.rename(f, new)
                     except PermissionError:
-                        time.sleep(0.001)
+                        dt = backoff_sleep(dt)
                         continue
                     else:
                         break
@@ -411,26 +530,33 @@ class ScanWorker(QtCore.QRunnable):
                 return
 
         restore_names(
-            extensions=list(self.valid_ext),
+            extensions=self.valid_ext,
             directory=self.base_dir,
             basename=self.base_file,
         )
 
     def _motion_loop(self):
-        for i in range(self.array.shape[0]):
+        # Positions as Python floats, and whether each axis has to move at each step.
+        # The first step always moves; afterwards, moves to the same position as the
+        # previous step are skipped.
+        rows: list[list[float]] = self.array.tolist()
+        move_mask = np.ones(self.array.shape, dtype=bool)
+        move_mask[1:] = ~np.isclose(self.array[1:], self.array[:-1])
+        moves: list[list[bool]] = move_mask.tolist()
+
+        for i, (row, row_moves) in enumerate(zip(rows, moves, strict=True)):
             if self._stopnow:
                 # Aborted before move
                 log.info("Aborted before move")
                 break
 
             self.signals.sigStepStarted.emit(i + 1)  # Step index is 1-based
-            for j in range(self.array.shape[1]):
-                if i != 0 and np.isclose(self.array[i, j], self.array[i - 1, j]):
-                    # Not first iteration and same position as previous, skip move
+            for j, (target, move) in enumerate(zip(row, row_moves, strict=True)):
+                if not move:
                     continue
                 # Execute move
-                log.debug(f"Moving ({i}, {j}) to target {self.array[i, j]}")
-                self.motors[j].move(self.array[i, j])
+                log.debug(f"Moving ({i}, {j}) to target {target}")
+                self.motors[j].move(target)
 
             # Execute sequence and wait until it finishes
             flag = self.sequence_run_wait()
@@ -442,7 +568,7 @@ class ScanWorker(QtCore.QRunnable):
             # Mangle filename so that SES ignores it
             self._rename_file(i + 1)
 
-            self.signals.sigStepFinished.emit(i + 1, tuple(self.array[i, :]))
+            self.signals.sigStepFinished.emit(i + 1, tuple(row))
             if self._stop:
                 # Aborted after scan
                 log.info("Aborted after step finished")
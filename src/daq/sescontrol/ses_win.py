@@ -1,6 +1,5 @@
 """Functions that use the Windows API to control SES.exe windows and menus."""
 
-import glob
 import logging
 import os
 import sys
@@ -9,14 +8,19 @@ from collections.abc import Callable, Iterable
 sys.coinit_flags = 2
 
 import configparser
-import shutil
-import tempfile
+import functools
+import io
+import msvcrt
 
 import psutil
 import pywinauto
+import pywinauto.controls.menuwrapper
+import win32.lib.pywintypes
 import win32com.client
 import win32con
+import win32file
 import win32gui
+import win32process
 
 SES_DIR = os.getenv("SES_BASE_PATH", "D:/SES_1.9.6_Win64")
 log = logging.getLogger("scan")
@@ -56,30 +60,37 @@ second element can be None.
 
 
 def get_ses_proc() -> psutil.Process:
-    for proc in psutil.process_iter():
-        if "Ses.exe" == proc.name():
+    # Prefetch names in a single pass instead of querying each process separately
+    for proc in psutil.process_iter(["name"]):
+        if proc.info["name"] == "Ses.exe":
             return proc
     raise RuntimeError("SES is not running")
 
 
+class _WindowFound(Exception):
+    """Raised from a window enumeration callback to stop the enumeration."""
+
+
 def get_matching_window(
     process: psutil.Process | int, match: Callable[[str], bool]
 ) -> int:
     """Get the first window handle of given process that matches the given function."""
-    if isinstance(process, int):
-        process = psutil.Process(process)
+    pid: int = process if isinstance(process, int) else process.pid
     windows = []
-    for thread in process.threads():
-        if len(windows) > 0:
-            break
 
-        def enum_windows_callback(hwnd, lParam):
-            if match(win32gui.GetWindowText(hwnd)):
-                windows.append(hwnd)
-            return True
-
-        thread_id = thread.id
-        win32gui.EnumThreadWindows(thread_id, enum_windows_callback, 0)
+    def enum_windows_callback(hwnd, lParam):
+        if win32process.GetWindowThreadProcessId(hwnd)[1] == pid and match(
+            win32gui.GetWindowText(hwnd)
+        ):
+            windows.append(hwnd)
+            raise _WindowFound
+        return True
+
+    # Enumerate top-level windows once instead of once per thread of the process
+    try:
+        win32gui.EnumWindows(enum_windows_callback, 0)
+    except _WindowFound:
+        pass
     if len(windows) == 0:
         raise RuntimeError("Matching window not found")
     return windows[0]
@@ -100,17 +111,68 @@ def get_ses_properties() -> tuple[int, int]:
     return proc.pid, get_ses_window(proc)
 
 
+def _open_shared(path: str | os.PathLike) -> io.TextIOWrapper:
+    """Open a file for reading without denying access to other processes.
+
+    Files opened with `open` may not be written by other processes on Windows. SES may
+    be writing to the file at the same time, so the file is opened with all sharing
+    modes enabled.
+    """
+    handle = win32file.CreateFile(
+        os.fspath(path),
+        win32file.GENERIC_READ,
+        win32file.FILE_SHARE_READ
+        | win32file.FILE_SHARE_WRITE
+        | win32file.FILE_SHARE_DELETE,
+        None,
+        win32file.OPEN_EXISTING,
+        0,
+        None,
+    )
+    # The handle stays owned by `handle` until the file object owns it, so that it is
+    # closed if anything below fails
+    fd = msvcrt.open_osfhandle(int(handle), os.O_RDONLY)
+    try:
+        f = open(fd)
+    except BaseException:
+        # Closing the descriptor also closes the underlying handle
+        os.close(fd)
+        handle.Detach()
+        raise
+    handle.Detach()
+    return f
+
+
 def get_file_info() -> tuple[str, str, set[str], int, list[dict[str, str]]]:
     """Read and parse the `factory.seq` file in the SES folder.
 
-    From the sequence file, we can determine where the current data is being saved.
+    From the sequence file, we can determine where the current data is being saved. The
+    file is only parsed again when it has been modified since the last call.
 
     """
+    fname = os.path.join(SES_DIR, "sequences", "factory.seq")
+    stat = os.stat(fname)
+    base_dir, base_file, valid_ext, saveafter, seq_enabled = _parse_file_info(
+        fname, stat.st_mtime_ns, stat.st_size
+    )
+    # Copy mutable parts so that callers cannot modify the cached result
+    return (
+        base_dir,
+        base_file,
+        set(valid_ext),
+        saveafter,
+        [dict(seq) for seq in seq_enabled],
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _parse_file_info(
+    fname: str, mtime_ns: int, size: int
+) -> tuple[str, str, set[str], int, list[dict[str, str]]]:
+    # `mtime_ns` and `size` are only used as part of the cache key
     config = configparser.RawConfigParser()
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        tmp = shutil.copy(os.path.join(SES_DIR, "sequences", "factory.seq"), tmpdirname)
-        with open(tmp) as f:
-            config.read_file(f)
+    with _open_shared(fname) as f:
+        config.read_file(f)
 
     spec = config["Spectrum"]
 
@@ -135,29 +197,47 @@ def get_file_info() -> tuple[str, str, set[str], int, list[dict[str, str]]]:
 
 def next_index(base_dir: str, base_file: str, valid_ext: Iterable[str]) -> int:
     """Infer the index of the upcoming data file from existing files."""
-    files = []
-    for ext in valid_ext:
-        files += glob.glob(os.path.join(base_dir, f"{base_file}*{ext}"))
+    # Find the most recently modified file matching the signature in a single pass over
+    # the directory. On Windows, the modification time of a directory entry is
+    # available without an additional stat call.
+    prefix: str = os.path.normcase(base_file)
+    suffixes: tuple[str, ...] = tuple(os.path.normcase(ext) for ext in valid_ext)
+    latest: str | None = None
+    latest_mtime: float = -float("inf")
+    try:
+        with os.scandir(base_dir) as it:
+            for entry in it:
+                name = os.path.normcase(entry.name)
+                if name.startswith(prefix) and name.endswith(suffixes):
+                    mtime = entry.stat().st_mtime
+                    if mtime >= latest_mtime:
+                        latest, latest_mtime = entry.name, mtime
+    except FileNotFoundError:
+        return 1
 
-    # get all files matching signature, sorted by time of last modification
-    files = [
-        os.path.basename(f) for f in sorted(files, key=lambda f: os.stat(f).st_mtime)
-    ]
-    if len(files) == 0:
+    if latest is None:
         return 1
     else:
-        return int(os.path.splitext(files[-1])[0][len(base_file) :][:4]) + 1
+        return int(os.path.splitext(latest)[0][len(base_file) :][:4]) + 1
 
 
 class SESController:
     def __init__(self):
         self._pid: int | None = None
+        self._proc: psutil.Process | None = None
+        # Resolved menu items, keyed by menu path
+        self._menu_items: dict[str, pywinauto.controls.menuwrapper.MenuItem] = {}
+        # Handle of the menu the cached items belong to
+        self._hmenu: int | None = None
         self.try_connect()
 
     def try_connect(self):
+        self._menu_items.clear()
+        self._hmenu = None
         try:
             self._pid, self._hwnd = get_ses_properties()
-        except RuntimeError:
+            self._proc = psutil.Process(self._pid)
+        except (RuntimeError, psutil.NoSuchProcess):
             return
         self._ses_app = pywinauto.Application(backend="win32").connect(
             process=self._pid
@@ -166,25 +246,64 @@ class SESController:
     def is_window_visible(self, match: Callable[[str], bool]) -> bool:
         if not self.alive:
             raise RuntimeError("SES is not running")
-        handle = get_matching_window(self._pid, match)
+        handle = get_matching_window(self._proc, match)
         return bool(win32gui.IsWindowVisible(handle))
 
+    def _menu_item(self, path: str) -> pywinauto.controls.menuwrapper.MenuItem:
+        """Return the menu item at `path`, resolving the path only once.
+
+        Cached items are discarded when the menu of the SES window is replaced.
+        """
+        hmenu: int = win32gui.GetMenu(self._hwnd)
+        if hmenu != self._hmenu:
+            self._menu_items.clear()
+            self._hmenu = hmenu
+        item = self._menu_items.get(path)
+        if item is None:
+            item = (
+                self._ses_app.window(handle=self._hwnd).menu().get_menu_path(path)[-1]
+            )
+            self._menu_items[path] = item
+        return item
+
+    def _enabled_menu_item(
+        self, path: str
+    ) -> tuple[pywinauto.controls.menuwrapper.MenuItem, bool]:
+        """Return the menu item at `path` and whether it is enabled.
+
+        If the cached item fails, the path is resolved again and retried once.
+        """
+        try:
+            item = self._menu_item(path)
+            return item, item.is_enabled()
+        except (OSError, win32.lib.pywintypes.error):
+            # The menu may have been rebuilt
+            self._menu_items.pop(path, None)
+            item = self._menu_item(path)
+            return item, item.is_enabled()
+
+    def is_enabled(self, path: str) -> bool:
+        """Return whether the menu item at `path` is enabled."""
+        if not self.alive:
+            raise RuntimeError("SES is not running")
+        return self._enabled_menu_item(path)[1]
+
     def click_menu(self, path: str, match: Callable[[str], bool] | None = None) -> int:
         # Click menu given by path. If the menu item opens some window, match needs to
         # be given as a function that returns True only for the window title.
         if not self.alive:
             raise RuntimeError("SES is not running")
         if match is not None:
-            handle = get_matching_window(self._pid, match)
+            handle = get_matching_window(self._proc, match)
             if bool(win32gui.IsWindowVisible(handle)):
                 # If already visible, avoid queuing another message
                 win32gui.BringWindowToTop(handle)
                 return 0
 
-        path = self._ses_app.window(handle=self._hwnd).menu().get_menu_path(path)
-        if path[-1].is_enabled():
-            path[-1].ctrl.post_message(path[-1].menu.COMMAND, path[-1].item_id())
-            pywinauto.win32functions.WaitGuiThreadIdle(path[-1].ctrl.handle)
+        item, enabled = self._enabled_menu_item(path)
+        if enabled:
+            item.ctrl.post_message(item.menu.COMMAND, item.item_id())
+            pywinauto.win32functions.WaitGuiThreadIdle(item.ctrl.handle)
             if match is not None:
                 # Bring the window to the top
                 win32gui.BringWindowToTop(handle)
@@ -192,16 +311,36 @@ class SESController:
         else:
             return 1
 
+    def command_menu(self, path: str) -> bool:
+        """Send the command of the menu item at `path` if it is enabled.
+
+        Unlike `click_menu`, the message is sent synchronously, so the command has been
+        handled by SES when this returns. Returns whether the item was enabled.
+        """
+        if not self.alive:
+            raise RuntimeError("SES is not running")
+        item, enabled = self._enabled_menu_item(path)
+        if enabled:
+            item.ctrl.send_message(item.menu.COMMAND, item.item_id())
+            pywinauto.win32functions.WaitGuiThreadIdle(item.ctrl.handle)
+        return enabled
+
     @property
     def alive(self) -> bool:
         """Returns wheter SES is running."""
-        if self._pid is None:
+        if self._proc is None:
             return False
-        try:
-            proc = psutil.Process(self._pid)
-        except psutil.NoSuchProcess:
+        # Checking the main window is much cheaper than querying the process. The
+        # window is destroyed when SES exits, and comparing the owning process guards
+        # against the handle being reused by another window.
+        if not (
+            win32gui.IsWindow(self._hwnd)
+            and win32process.GetWindowThreadProcessId(self._hwnd)[1] == self._pid
+        ):
+            # Menu items of the closed instance are no longer valid
+            self._menu_items.clear()
             return False
-        return proc.name() == "Ses.exe"
+        return True
 
     def run_sequence(self):
         return self.click_menu("Sequence->Run")
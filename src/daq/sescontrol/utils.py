@@ -0,0 +1,102 @@
+"""Helpers that do not depend on Qt or pywin32."""
+
+import concurrent.futures
+import os
+import shutil
+import time
+from collections.abc import Iterable
+
+TEMPFILE_PREFIX: str = "_tmp_"  #: Prefix to use for working files
+
+
+def backoff_sleep(dt: float, maximum: float = 0.1, factor: float = 1.5) -> float:
+    """Sleep for `dt` seconds and return the interval to use for the next retry.
+
+    The interval grows geometrically by `factor` up to `maximum`, so that retry loops
+    react quickly at first without spinning when the condition takes a while.
+    """
+    time.sleep(dt)
+    return min(dt * factor, maximum)
+
+
+def _merge_existing(f: str, new: str):
+    """Handle a mangled file whose original name is already taken.
+
+    Motor logs are appended to the existing log; other files are left untouched so that
+    no data is overwritten.
+    """
+    if f.endswith(".csv"):
+        # Both logs are written by csv.writer and end with a line terminator, so the
+        # rows can be appended as bytes without parsing
+        with open(f, "rb") as source_csv, open(new, "ab") as dest_csv:
+            shutil.copyfileobj(source_csv, dest_csv, length=1 << 20)
+        os.remove(f)
+
+
+def _restore_name(f: str, new: str, exists: bool = False):
+    """Rename a single mangled file, merging motor logs if the target exists."""
+    if exists:
+        _merge_existing(f, new)
+        return
+    dt: float = 0.001
+    while True:
+        try:
+            os.rename(f, new)
+        except PermissionError:
+            dt = backoff_sleep(dt)
+            continue
+        except FileExistsError:
+            _merge_existing(f, new)
+            break
+        else:
+            break
+
+
+def restore_names(extensions: Iterable[str], directory: str, basename: str):
+    # Get all mangled files in a single pass over the directory; names are compared
+    # with normcase to match case-insensitively on Windows like glob does
+    prefix: str = os.path.normcase(TEMPFILE_PREFIX + basename)
+    suffixes: tuple[str, ...] = tuple(
+        os.path.normcase(ext) for ext in [*extensions, ".csv"]
+    )
+    names: list[str] = []
+    # All names in the directory, used to tell whether a restored name is taken
+    # without relying on the rename failing
+    listed: set[str] = set()
+    with os.scandir(directory) as it:
+        for entry in it:
+            name = os.path.normcase(entry.name)
+            listed.add(name)
+            if name.startswith(prefix) and name.endswith(suffixes):
+                names.append(entry.name)
+
+    restored = [name[len(TEMPFILE_PREFIX) :] for name in names]
+    sources = [os.path.join(directory, name) for name in names]
+    targets = [os.path.join(directory, name) for name in restored]
+    exists = [os.path.normcase(name) in listed for name in restored]
+    if len(names) < 2:
+        for f, new, ex in zip(sources, targets, exists, strict=True):
+            _restore_name(f, new, ex)
+        return
+
+    # Each file maps to a distinct target, so they can be renamed concurrently. The
+    # latency of each rename dominates on Windows, especially for network drives.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(names))) as ex:
+        # Consume the iterator to propagate exceptions
+        list(ex.map(_restore_name, sources, targets, exists))
+
+
+def welford_update(
+    stats: tuple[int, float, float], value: float
+) -> tuple[int, float, float]:
+    """Add `value` to running statistics `(n, mean, m2)` with Welford's algorithm.
+
+    `m2` is the sum of squared deviations from the mean, so the population variance
+    is `m2 / n`. Each update takes constant time.
+    """
+    n, mean, m2 = stats
+    n += 1
+    delta = value - mean
+    mean += delta / n
+    m2 += delta * (value - mean)
+    return n, mean, m2
@@ -1,11 +1,14 @@
 import datetime
+import functools
 import gc
 import logging
+import math
 import os
 import sys
 import time
 import uuid
 from collections.abc import Callable, Sequence
+from typing import Literal
 
 import humanize
 import numpy as np
@@ -19,8 +22,9 @@ from qtpy import QtCore, QtGui, QtWidgets, uic
 
 from sescontrol.liveviewer import LiveImageTool, WorkFileImageTool
 from sescontrol.plugins import Motor
-from sescontrol.scan import MotorPosWriter, ScanWorker, gen_data_name, restore_names
+from sescontrol.scan import MotorPosWriter, ScanWorker, gen_data_name
 from sescontrol.ses_win import SES_ACTIONS, SESController, get_file_info, next_index
+from sescontrol.utils import restore_names, welford_update
 
 # pywinauto imports must come after Qt imports
 # https://github.com/pywinauto/pywinauto/issues/472#issuecomment-489816553
@@ -33,6 +37,19 @@ except:  # noqa: E722
 log = logging.getLogger("scan")
 
 
+@functools.lru_cache(maxsize=16)
+def _linear_coord(start: float, delta: float, nstep: int) -> npt.NDArray[np.float64]:
+    """Return `nstep` points starting at `start` with spacing `delta`.
+
+    The result is cached and shared between callers, so it is made read-only.
+    """
+    coord = np.arange(nstep, dtype=np.float64)
+    coord *= delta
+    coord += start
+    coord.flags.writeable = False
+    return coord
+
+
 class SingleMotorSetup(QtWidgets.QGroupBox):
     valueChanged = QtCore.Signal(float, float, float, int)
 
@@ -50,17 +67,16 @@ class SingleMotorSetup(QtWidgets.QGroupBox):
         self.layout().addWidget(motors)
         motors.setLayout(QtWidgets.QFormLayout(motors))
 
-        self.motor_coord = np.linspace(0, 1, 11)
+        # Coordinates are generated on demand from (start, delta, nstep)
+        start, end, delta, nstep = 0.0, 1.0, 0.1, 11
+        self._coord_params: tuple[float, float, int] = (start, delta, nstep)
         self.start, self.end, self.delta, self.nstep = (
-            pg.SpinBox(compactHeight=False, value=self.motor_coord[0]),
-            pg.SpinBox(compactHeight=False, value=self.motor_coord[-1]),
-            pg.SpinBox(
-                compactHeight=False,
-                value=self.motor_coord[1] - self.motor_coord[0],
-            ),
+            pg.SpinBox(compactHeight=False, value=start),
+            pg.SpinBox(compactHeight=False, value=end),
+            pg.SpinBox(compactHeight=False, value=delta),
             pg.SpinBox(
                 compactHeight=False,
-                value=len(self.motor_coord),
+                value=nstep,
                 int=True,
                 step=1,
                 min=2,
@@ -76,26 +92,76 @@ class SingleMotorSetup(QtWidgets.QGroupBox):
         self.nstep.sigValueChanged.connect(self.countchanged)
         self.delta.sigValueChanged.connect(self.deltachanged)
 
-    def _refresh_values(self):
-        for w in (self.start, self.end, self.delta, self.nstep):
-            w.blockSignals(True)
+        # Changes arriving in quick succession are coalesced into a single recompute and
+        # update, using the last edited value to decide what to keep fixed
+        self._pending_mode: Literal["bounds", "count", "delta"] | None = None
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(16)
+        self._refresh_timer.timeout.connect(self._do_refresh)
 
-        self.start.setValue(self.motor_coord[0])
-        self.end.setValue(self.motor_coord[-1])
-        self.delta.setValue(self.motor_coord[1] - self.motor_coord[0])
-        self.nstep.setValue(len(self.motor_coord))
+        # Last values emitted through valueChanged
+        self._last_emit: tuple[float, float, float, int] | None = None
 
-        for w in (self.start, self.end, self.delta, self.nstep):
-            w.blockSignals(False)
+    def _schedule_refresh(self, mode: Literal["bounds", "count", "delta"]):
+        self._pending_mode = mode
+        self._refresh_timer.start()
 
-        self.valueChanged.emit(
-            self.start.value(), self.end.value(), self.delta.value(), self.nstep.value()
-        )
+    def _flush_refresh(self):
+        """Apply a pending refresh immediately, so that the parameters are current."""
+        if self._refresh_timer.isActive():
+            self._refresh_timer.stop()
+            self._do_refresh()
+
+    @QtCore.Slot()
+    def _do_refresh(self):
+        if self._pending_mode is not None:
+            self._recompute(self._pending_mode)
+            self._pending_mode = None
+        start, delta, nstep = self._coord_params
+        end = start + delta * (nstep - 1)
+
+        # Write all four values before the group box is repainted once
+        self.setUpdatesEnabled(False)
+        try:
+            with (
+                QtCore.QSignalBlocker(self.start),
+                QtCore.QSignalBlocker(self.end),
+                QtCore.QSignalBlocker(self.delta),
+                QtCore.QSignalBlocker(self.nstep),
+            ):
+                for w, value in (
+                    (self.start, start),
+                    (self.end, end),
+                    (self.delta, delta),
+                    (self.nstep, nstep),
+                ):
+                    if w.value() != value:
+                        w.setValue(value)
+        finally:
+            self.setUpdatesEnabled(True)
+
+        if self._last_emit is not None:
+            # Only notify when the grid has actually changed
+            *last_floats, last_nstep = self._last_emit
+            if nstep == last_nstep and all(
+                math.isclose(new, old)
+                for new, old in zip((start, end, delta), last_floats, strict=True)
+            ):
+                return
+        self._last_emit = (start, end, delta, nstep)
+        self.valueChanged.emit(start, end, delta, nstep)
+
+    @property
+    def motor_coord(self) -> npt.NDArray[np.float64]:
+        self._flush_refresh()
+        return _linear_coord(*self._coord_params)
 
     @property
     def npoints(self) -> int:
         if self.isChecked():
-            return len(self.motor_coord)
+            self._flush_refresh()
+            return self._coord_params[2]
         else:
             return 1
 
@@ -115,10 +181,11 @@ class SingleMotorSetup(QtWidgets.QGroupBox):
             minimum = -np.inf
         if maximum is None:
             maximum = np.inf
-        self.start.setMinimum(minimum)
-        self.end.setMinimum(minimum)
-        self.start.setMaximum(maximum)
-        self.end.setMaximum(maximum)
+        for w in (self.start, self.end):
+            bounds = tuple(None if b is None else float(b) for b in w.opts["bounds"])
+            if bounds != (minimum, maximum):
+                # Sets both limits and clamps the value only once
+                w.setOpts(bounds=(minimum, maximum))
 
     def set_default_delta(self, value: float):
         """Set initial value for delta and whether to allow changes."""
@@ -126,50 +193,43 @@ class SingleMotorSetup(QtWidgets.QGroupBox):
         self.end.setSingleStep(value)
         self.delta.setValue(value)
 
-    @QtCore.Slot()
-    def countchanged(self):
-        delta = self.delta.value()
+    def _recompute(self, mode: Literal["bounds", "count", "delta"]):
+        """Update the coordinate parameters after one of the spinboxes changed.
 
-        self.motor_coord = np.linspace(
-            self.start.value(),
-            self.start.value() + delta * (self.nstep.value() - 1),
-            self.nstep.value(),
-        )
+        Parameters
+        ----------
+        mode
+            Which value was edited by the user. If ``"count"``, the number of points is
+            kept and the end point follows. Otherwise, the number of points is inferred
+            from the bounds and the step size.
+
+        """
+        start, end = self.start.value(), self.end.value()
+        delta, nstep = self.delta.value(), self.nstep.value()
 
-        self._refresh_values()
+        if mode != "count":
+            if delta == 0:
+                delta = 1e-3
+            if start == end:
+                end = start + delta
+            if np.sign(end - start) != np.sign(delta):
+                delta = -delta
+            # At least two points so that the spacing is well defined
+            nstep = max(round((end - start) / delta) + 1, 2)
+
+        self._coord_params = (start, delta, nstep)
+
+    @QtCore.Slot()
+    def countchanged(self):
+        self._schedule_refresh("count")
 
     @QtCore.Slot()
     def boundschanged(self):
-        if self.start.value() == self.end.value():
-            self.end.setValue(self.end.value() + self.delta.value())
-            return
-        self.deltachanged()
+        self._schedule_refresh("bounds")
 
     @QtCore.Slot()
     def deltachanged(self):
-        if self.delta.value() == 0:
-            self.delta.setValue(1e-3)
-            return
-        delta = self.delta.value()
-        difference = self.end.value() - self.start.value()
-
-        if np.sign(difference) != np.sign(delta):
-            self.delta.setValue(-delta)
-            return
-
-        nstep = round(difference / delta) + 1
-        if nstep <= 1:
-            self.motor_coord = np.array(
-                [
-                    self.start.value(),
-                    self.start.value() + self.delta.value(),
-                ]
-            )
-        else:
-            self.motor_coord = np.linspace(
-                self.start.value(), self.start.value() + delta * (nstep - 1), nstep
-            )
-        self._refresh_values()
+        self._schedule_refresh("delta")
 
 
 class ArrayTableModel(QtCore.QAbstractTableModel):
@@ -361,6 +421,45 @@ class RenameDialog(*uic.loadUiType("sescontrol/renamedialog.ui")):
         )
 
 
+class MotorLimitSignals(QtCore.QObject):
+    sigLimits = QtCore.Signal(str, object)
+
+
+class MotorLimitWorker(QtCore.QRunnable):
+    """Query the limits of a motor plugin in a background thread.
+
+    Emits the name of the motor and a tuple of minimum, maximum, default step size and
+    whether the step size is fixed.
+    """
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self.signals = MotorLimitSignals()
+
+    def run(self):
+        try:
+            plugin_instance = Motor.plugins[self.name]()
+            plugin_instance.pre_motion()
+            mn, mx = plugin_instance.minimum, plugin_instance.maximum
+            delta = plugin_instance.delta
+            fix_delta = plugin_instance.fix_delta
+            plugin_instance.post_motion()
+        except Exception:
+            log.exception(f"Failed to get limits of motor {self.name}")
+            self.signals.sigLimits.emit(self.name, None)
+            return
+
+        # properly cast into float in case the return type is incompatible
+        if mn is not None:
+            mn = float(mn)
+        if mx is not None:
+            mx = float(mx)
+        if delta is not None:
+            delta = float(delta)
+        self.signals.sigLimits.emit(self.name, (mn, mx, delta, fix_delta))
+
+
 class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
     sigStopPoint = QtCore.Signal()
     sigCancelStopPoint = QtCore.Signal()
@@ -370,23 +469,52 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
         self.setupUi(self)
         self.setWindowFlags(QtCore.Qt.WindowStaysOnTopHint)
 
+        # Motor changes are collected and their limits applied once control returns to
+        # the event loop; indices of the motor widgets to update
+        self._pending_limits: set[int] = set()
+        self._limits_timer = QtCore.QTimer(self)
+        self._limits_timer.setSingleShot(True)
+        self._limits_timer.setInterval(0)
+        self._limits_timer.timeout.connect(self._apply_pending_limits)
+
+        # Both axis combo boxes show the same list of motors, so they share one model
+        self._axes_model = QtCore.QStringListModel(self)
         for i, motor in enumerate(self.motors):
+            motor.combo.setModel(self._axes_model)
             motor.combo.currentTextChanged.connect(
                 lambda *, ind=i: self.motor_changed(ind)
             )
             motor.toggled.connect(lambda *, ind=i: self.motor_changed(ind))
+
+        # Limits queried from motor plugins, keyed by motor name
+        self._limit_cache: dict[
+            str, tuple[float | None, float | None, float | None, bool]
+        ] = {}
+        # Motors with a limit query running in the background
+        self._limit_queries: set[str] = set()
+        # Limits are not queried or applied while a scan is running; indices of the
+        # motor widgets to update after the scan
+        self._scanning: bool = False
+        self._deferred_limits: set[int] = set()
+        self.threadpool = QtCore.QThreadPool.globalInstance()
+        # Motor plugins may share a connection that is not thread-safe, so limits are
+        # queried one at a time in a separate pool that is drained before each scan
+        self._limit_pool = QtCore.QThreadPool(self)
+        self._limit_pool.setMaxThreadCount(1)
         self.update_motor_list()
 
         self.start_btn.clicked.connect(self.start_scan)
         self.stop_point_btn.clicked.connect(self.handle_stop_point)
 
-        self.pos_logger = MotorPosWriter()
-        self.threadpool = QtCore.QThreadPool.globalInstance()
-        self.threadpool.start(self.pos_logger)
+        self.pos_logger = MotorPosWriter(self)
+        self.pos_logger.start()
 
         self.current_file: str | None = None
         self.start_time: float | None = None
-        self.step_times: list[float] = []
+        # Time from start when the last step finished, and running statistics of the
+        # step durations (count, mean, sum of squared deviations)
+        self._last_step_time: float = 0.0
+        self._step_stats: tuple[int, float, float] = (0, 0.0, 0.0)
 
         self._workfileitool: WorkFileImageTool | None = None
         self._itools: dict[str, LiveImageTool] = {}
@@ -394,6 +522,9 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
 
         self.motor_dialog: MotorDialog = MotorDialog()
 
+        # Connection to SES, kept across scans and reconnected when SES restarts
+        self._ses: SESController | None = None
+
         self.rename_dialog: RenameDialog = RenameDialog()
 
         # Timer to update remaining time for current scan
@@ -403,6 +534,12 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
 
         # Current iteration, used for progress bar
         self._niter: int = 0
+        # Number of points of the running scan, fixed when the scan starts
+        self._scan_numpoints: int = 1
+        # Names of the motors of the running scan in the order of the emitted positions
+        self._scan_motors: list[str] = []
+        # Beginning of the status line, shared by every step of the running scan
+        self._status_prefix: str = ""
 
     @QtCore.Slot()
     def _workfile_viewer_closed(self):
@@ -452,42 +589,93 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
         return self.motors[0].isChecked() or self.motors[1].isChecked()
 
     def update_motor_list(self):
-        for i, m in enumerate(self.motors):
-            m.combo.blockSignals(True)
-            m.combo.clear()
-            m.combo.addItems(self.valid_axes)
-            m.combo.setCurrentIndex(i)
-            m.combo.blockSignals(False)
+        self._limit_cache.clear()
+        with (
+            QtCore.QSignalBlocker(self.motor1.combo),
+            QtCore.QSignalBlocker(self.motor2.combo),
+        ):
+            self._axes_model.setStringList(self.valid_axes)
+            for i, m in enumerate(self.motors):
+                m.combo.setCurrentIndex(i)
+        for m in self.motors:
             m.setChecked(False)
 
     def motor_changed(self, index):
         # apply motion limits
         #!TODO: this is stupid
-        self.update_motor_limits(index)
+        self._pending_limits.add(index)
+        self._limits_timer.start()
+
+    @QtCore.Slot()
+    def _apply_pending_limits(self):
+        pending, self._pending_limits = self._pending_limits, set()
+        for index in pending:
+            self.update_motor_limits(index)
+
+    @QtCore.Slot()
+    def refresh_motor_limits(self):
+        """Query the limits of the selected motors again."""
+        self._limit_cache.clear()
+        for index in range(len(self.motors)):
+            self.motor_changed(index)
 
     def update_motor_limits(self, index: int):
-        """Get motor limits from corresponding plugin and update values."""
-        try:
-            plugin: Motor = Motor.plugins[self.motors[index].name]
-        except KeyError:
+        """Get motor limits from corresponding plugin and update values.
+
+        Limits are queried from the plugin once per motor and cached, since
+        `pre_motion` may need to communicate with the hardware. The cache is cleared
+        after each scan and by `refresh_motor_limits`. Queries run in a background
+        thread so that slow hardware does not block the GUI, one motor at a time.
+        """
+        name: str = self.motors[index].name
+        if name not in Motor.plugins:
             return
-        else:
-            plugin_instance = plugin()
-            plugin_instance.pre_motion()
-            mn, mx = plugin_instance.minimum, plugin_instance.maximum
-            # properly cast into float in case the return type is incompatible
-            if mn is not None:
-                mn = float(mn)
-            if mx is not None:
-                mx = float(mx)
-
-            motor = self.motors[index]
-            motor.set_limits(mn, mx)
-            if plugin_instance.delta is not None:
-                motor.set_default_delta(float(plugin_instance.delta))
-            motor.delta.setDisabled(plugin_instance.fix_delta)
 
-            plugin_instance.post_motion()
+        if self._scanning:
+            # The scan worker is using the motors
+            self._deferred_limits.add(index)
+            return
+
+        limits = self._limit_cache.get(name)
+        if limits is not None:
+            self._apply_limits(index, limits)
+        elif name not in self._limit_queries:
+            self._limit_queries.add(name)
+            worker = MotorLimitWorker(name)
+            worker.signals.sigLimits.connect(self._limits_received)
+            self._limit_pool.start(worker)
+
+    @QtCore.Slot(str, object)
+    def _limits_received(
+        self,
+        name: str,
+        limits: tuple[float | None, float | None, float | None, bool] | None,
+    ):
+        self._limit_queries.discard(name)
+        if limits is None:
+            return
+        self._limit_cache[name] = limits
+        # The selection may have changed while the query was running
+        for index, motor in enumerate(self.motors):
+            if motor.name == name:
+                self._apply_limits(index, limits)
+
+    def _apply_limits(
+        self,
+        index: int,
+        limits: tuple[float | None, float | None, float | None, bool],
+    ):
+        if self._scanning:
+            # Changing the bounds would change the scan parameters, the cached limits
+            # are applied in `post_process`
+            self._deferred_limits.add(index)
+            return
+        motor = self.motors[index]
+        mn, mx, delta, fix_delta = limits
+        motor.set_limits(mn, mx)
+        if delta is not None:
+            motor.set_default_delta(delta)
+        motor.delta.setDisabled(fix_delta)
 
     @QtCore.Slot()
     def handle_stop_point(self):
@@ -498,12 +686,23 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
             self.sigStopPoint.emit()
             self.stop_point_btn.setText("Cancel Stop")
 
+    @property
+    def ses(self) -> SESController:
+        """Controller connected to the running SES instance."""
+        if self._ses is None:
+            self._ses = SESController()
+        elif not self._ses.alive:
+            self._ses.try_connect()
+        return self._ses
+
     def is_startable(self):
-        ses = SESController()
-        path = (
-            ses._ses_app.window(handle=ses._hwnd).menu().get_menu_path("Sequence->Run")
-        )
-        if not path[-1].is_enabled():
+        ses = self.ses
+        if not ses.alive:
+            QtWidgets.QMessageBox.critical(
+                self, "Cannot start scan", "SES is not running."
+            )
+            return False
+        if not ses.is_enabled("Sequence->Run"):
             QtWidgets.QMessageBox.critical(
                 self,
                 "Cannot start scan",
@@ -571,6 +770,9 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
                     motor_coords, motion_raster, base_dir, base_file, data_idx
                 )
 
+        # Queries still running would talk to the motors at the same time as the scan
+        self._limit_pool.waitForDone()
+
         # Prepare before start
         self.pre_process()
 
@@ -580,10 +782,22 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
                 dirname=base_dir, base_file=base_file, data_idx=data_idx, motors=motors
             )
         scan_worker = ScanWorker(
-            motors, motion_array, base_dir, base_file, data_idx, valid_ext, has_da
+            motors,
+            motion_array,
+            base_dir,
+            base_file,
+            data_idx,
+            valid_ext,
+            has_da,
+            ses=self.ses,
         )
-        scan_worker.signals.sigStepFinished.connect(self.step_finished)
-        scan_worker.signals.sigStepFinished.connect(self.update_live)
+        scan_worker.signals.sigStepFinished.connect(self._on_step_finished)
+        if self.has_motor:
+            # Log positions from the worker thread without going through the GUI
+            scan_worker.signals.sigStepFinished.connect(
+                self.pos_logger.enqueue_point,
+                QtCore.Qt.ConnectionType.DirectConnection,
+            )
         scan_worker.signals.sigStepStarted.connect(self.step_started)
         scan_worker.signals.sigFinished.connect(self.post_process)
         self.stop_btn.clicked.connect(scan_worker.force_stop)
@@ -592,9 +806,12 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
         self.sigCancelStopPoint.connect(scan_worker.cancel_stop_after_point)
 
         self.current_file = scan_worker.data_name
+        self._scan_motors = motors
+        self._status_prefix = f"{self.current_file} | "
 
         self.start_time = time.perf_counter()
-        self.step_times.append(0.0)
+        self._last_step_time = 0.0
+        self._step_stats = (0, 0.0, 0.0)
         self.threadpool.start(scan_worker)
 
     @QtCore.Slot()
@@ -603,18 +820,18 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
             return
 
         text: str = f"{self.current_file}"
-        if self._niter == 1:
+        n, step_time_avg, m2 = self._step_stats
+        if self._niter == 1 or n == 0:
             text += " started"
         else:
-            step_times = np.diff(self.step_times)
-            step_time_avg = np.mean(step_times)
-            step_time_stderr = np.std(step_times) / np.sqrt(len(step_times))
+            # Standard error of the mean, std / sqrt(n)
+            step_time_stderr = math.sqrt(m2) / n
 
             after_point = (
-                self.numpoints - self._niter
+                self._scan_numpoints - self._niter
             ) * step_time_avg  # Time left excluding current point
             last_step_finished = (
-                self.start_time + self.step_times[-1]
+                self.start_time + self._last_step_time
             )  # When the last step finished
             point_remaining = step_time_avg - (
                 time.perf_counter() - last_step_finished
@@ -643,43 +860,49 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
 
         self.line.setText(text)
 
+    def _add_step_time(self, elapsed: float):
+        """Update step duration statistics with a step that finished at `elapsed`."""
+        duration = elapsed - self._last_step_time
+        self._last_step_time = elapsed
+
+        self._step_stats = welford_update(self._step_stats, duration)
+
     @QtCore.Slot(int)
     def step_started(self, niter: int):
         self._niter = niter
         self.update_remaining_time()
         self.timeleft_update_timer.start()
 
+    @QtCore.Slot(int, object)
+    def _on_step_finished(self, niter: int, pos: tuple[float, ...]):
+        # Single receiver for the worker signal, so that each step is delivered to the
+        # GUI thread with one queued call
+        self.step_finished(niter, pos)
+        self.update_live(niter, pos)
+
     @QtCore.Slot(int, object)
     def step_finished(self, niter: int, pos: tuple[float, ...]):
         self.timeleft_update_timer.stop()
-        self.step_times.append(time.perf_counter() - self.start_time)
+        self._add_step_time(time.perf_counter() - self.start_time)
 
         # Display status
-        text: str = f"{self.current_file} | "
-
-        motor_info: list[str] = []
-        for p, motor in zip(pos, self.motors, strict=False):
-            motor_info.append(f"{motor.name} = {p:.3f}")
-        text += ", ".join(motor_info)
+        text: str = self._status_prefix + ", ".join(
+            f"{name} = {p:.3f}" for name, p in zip(self._scan_motors, pos, strict=False)
+        )
         text += " done"
-        if niter < self.numpoints:
+        if niter < self._scan_numpoints:
             text += ", moving to next point..."
 
         self.line.setText(text)
         self.progress.setValue(niter)
 
-        if self.has_motor:
-            # Enter log entry
-            entry = [niter] + [float(p) for p in pos]
-            self.pos_logger.write_pos([str(x) for x in entry])
-
     @QtCore.Slot(int, object)
     def update_live(self, niter, *args):
         if self.itool is None:
             return
         self.itool.trigger_fetch(niter)
 
-        if self.numpoints == 1 and manager.is_running():
+        if self._scan_numpoints == 1 and manager.is_running():
             # Do not show window here, it will be shown after the scan
             return
 
@@ -688,6 +911,7 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
 
     @QtCore.Slot()
     def pre_process(self):
+        self._scanning = True
         # disable scan window during scan
         for m in self.motors:
             m.setDisabled(True)
@@ -697,7 +921,8 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
         if self.itool is not None:
             self.itool.set_busy(True)
 
-        self.progress.setRange(0, self.numpoints)
+        self._scan_numpoints = self.numpoints
+        self.progress.setRange(0, self._scan_numpoints)
         self.progress.setTextVisible(True)
 
     @QtCore.Slot()
@@ -725,7 +950,14 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
         self.progress.reset()
         self.progress.setTextVisible(False)
         self.start_time = None
-        self.step_times = []
+
+        # Limits may depend on the motor positions, like those of Beam, so they are
+        # queried again. Update limits deferred during the scan.
+        self._limit_cache.clear()
+        self._scanning = False
+        deferred, self._deferred_limits = self._deferred_limits, set()
+        for index in deferred:
+            self.motor_changed(index)
 
     def initialize_logging(
         self,
@@ -754,6 +986,7 @@ class ScanType(*uic.loadUiType("sescontrol/scantype.ui")):
                 event.ignore()
                 return
         self.pos_logger.stop()
+        self.pos_logger.wait()
         super().closeEvent(event)
 
 
@@ -1,13 +1,73 @@
 import datetime
+import functools
+import itertools
 from collections.abc import Callable, Iterable, Sequence
 
 import numpy as np
 import pyqtgraph as pg
-from qtpy import QtCore, QtGui
+from qtpy import QtCore, QtGui, QtWidgets
 
 from qt_extensions.legendtable import LegendTableView
 
 
+def _is_sorted(x: np.ndarray | None) -> bool:
+    """Return whether `x` is sorted in non-decreasing order."""
+    if x is None or len(x) == 0:
+        return False
+    return bool(np.all(x[1:] >= x[:-1]))
+
+
+def _scratch_buffer(x: np.ndarray | None, buf: np.ndarray | None) -> np.ndarray | None:
+    """Return a float64 array with the shape of `x`, reusing `buf` if possible."""
+    if x is None:
+        return None
+    if buf is None or buf.shape != x.shape:
+        return np.empty(x.shape, dtype=np.float64)
+    return buf
+
+
+def _nearest_index(
+    x: np.ndarray,
+    value: float,
+    is_sorted: bool = False,
+    out: np.ndarray | None = None,
+) -> int:
+    """Return the index of the element in `x` closest to `value`.
+
+    If `is_sorted` is True, `x` must be sorted in non-decreasing order and a binary
+    search is used instead of a scan over the whole array. Otherwise, the distances are
+    computed in `out` if given to avoid allocating temporary arrays.
+    """
+    if not is_sorted:
+        if out is None:
+            return int(np.argmin(np.abs(x - value)))
+        np.subtract(x, value, out=out)
+        np.fabs(out, out=out)
+        return int(out.argmin())
+    idx = int(np.searchsorted(x, value))
+    if idx == 0:
+        return 0
+    if idx == len(x) or value - x[idx - 1] <= x[idx] - value:
+        # Like argmin, return the first of repeated values and the lower index on ties
+        return int(np.searchsorted(x, x[idx - 1]))
+    return idx
+
+
+def _as_float_arrays(
+    x: Sequence[float], ylist: Iterable[Sequence[float]]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Convert x and a collection of y values to contiguous float64 arrays.
+
+    The y values are stacked into a single 2D array with one row per curve.
+    """
+    if not isinstance(ylist, np.ndarray):
+        ylist = list(ylist)
+    return (
+        np.ascontiguousarray(x, dtype=np.float64),
+        np.ascontiguousarray(ylist, dtype=np.float64),
+    )
+
+
 class SnapCurveItem(pg.PlotCurveItem):
     # Adapted from https://stackoverflow.com/a/68857695
 
@@ -22,6 +82,9 @@ class SnapCurveItem(pg.PlotCurveItem):
         **kwargs,
     ):
         self.hoverable = hoverable
+        # Whether xData is sorted, None if not checked since the data last changed
+        self._x_is_sorted: bool | None = None
+        self._scratch: np.ndarray | None = None
 
         if target_kw is None:
             target_kw = {}
@@ -35,6 +98,21 @@ class SnapCurveItem(pg.PlotCurveItem):
         self.setAcceptHoverEvents(True)
         self.setClickable(True, 20)
 
+    def _set_cached(self, cached: bool):
+        """Enable or disable caching the rendered curve in a pixmap.
+
+        The cache is only used while the curve is hovered, so that moving the target
+        does not repaint the curve. Otherwise, the cache would be rebuilt on every data
+        update and view range change, which is slower than painting the curve directly.
+        """
+        mode = (
+            QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache
+            if cached
+            else QtWidgets.QGraphicsItem.CacheMode.NoCache
+        )
+        if self.cacheMode() != mode:
+            self.setCacheMode(mode)
+
     def setPen(self, *args, **kargs):
         super().setPen(*args, **kargs)
 
@@ -43,6 +121,21 @@ class SnapCurveItem(pg.PlotCurveItem):
         if self.target.label() is not None:
             self.target.label().setColor(self.target.pen.color())
 
+    def updateData(self, *args, **kargs):
+        super().updateData(*args, **kargs)
+        # Checked on the next hover, data may be updated many times in between
+        self._x_is_sorted = None
+        self._set_cached(False)
+
+    def _nearest_data_index(self, value: float) -> int:
+        """Return the index of the data point with x closest to `value`."""
+        if self._x_is_sorted is None:
+            self._x_is_sorted = _is_sorted(self.xData)
+        if self._x_is_sorted:
+            return _nearest_index(self.xData, value, True)
+        self._scratch = _scratch_buffer(self.xData, self._scratch)
+        return _nearest_index(self.xData, value, False, self._scratch)
+
     @QtCore.Slot(bool)
     def setHoverable(self, hoverable: bool):
         self.hoverable = hoverable
@@ -52,19 +145,25 @@ class SnapCurveItem(pg.PlotCurveItem):
     def viewRangeChanged(self):
         super().viewRangeChanged()
         self._mouseShape = None
+        self._set_cached(False)
 
     def hoverEvent(self, ev):
         if not self.hoverable:
             return
+        if ev.isExit() and not self.target.isVisible():
+            # Not hovered before either, nothing to update
+            return
         if ev.isExit() or not self.mouseShape().contains(ev.pos()):
             if self.target is not None:
                 self.target.setVisible(False)
+            self._set_cached(False)
             self.sigCurveNotHovered.emit(self, ev)
         else:
             if self.target is not None:
-                ind = np.argmin(np.abs(self.xData - ev.pos().x()))
+                ind = self._nearest_data_index(ev.pos().x())
                 self.target.setPos(self.xData[ind], self.yData[ind])
                 self.target.setVisible(True)
+            self._set_cached(True)
             self.sigCurveHovered.emit(self, ev)
 
 
@@ -106,10 +205,16 @@ class SnapCurvePlotDataItem(pg.PlotDataItem):
         return label
 
 
+@functools.lru_cache(maxsize=256)
+def _format_timestamp(x: float) -> str:
+    # Hovering and cursor updates format the same timestamps repeatedly
+    return datetime.datetime.fromtimestamp(max(x, 0)).strftime("%m/%d %H:%M:%S")
+
+
 class XDateSnapCurvePlotDataItem(SnapCurvePlotDataItem):
     @staticmethod
     def format_x(x: float) -> str:
-        return datetime.datetime.fromtimestamp(max(x, 0)).strftime("%m/%d %H:%M:%S")
+        return _format_timestamp(float(x))
 
 
 class DynamicPlotItem(pg.PlotItem):
@@ -132,6 +237,19 @@ class DynamicPlotItem(pg.PlotItem):
             plot_kw = {}
         self.plot_kw: dict = plot_kw
         self.plots: list[pg.PlotDataItem] = []
+        # Data for disabled curves, applied when the curve is enabled again
+        self._pending_data: dict[pg.PlotDataItem, tuple] = {}
+        # Curves with the same version share the same x values
+        self._x_versions: dict[pg.PlotDataItem, int] = {}
+        self._x_counter = itertools.count()
+        # Whether the x values of each curve are sorted, missing if not checked yet
+        self._x_sorted: dict[pg.PlotDataItem, bool] = {}
+        # Buffer for nearest-point lookups on unsorted x values
+        self._scratch: np.ndarray | None = None
+        # Color and pen options last applied to each curve
+        self._pen_keys: dict[pg.PlotDataItem, tuple[int, tuple]] = {}
+        # Color names for the cursor label, updated with the pen
+        self._color_names: dict[pg.PlotDataItem, str] = {}
         if ncurves is not None:
             self.set_ncurves(ncurves)
 
@@ -150,7 +268,15 @@ class DynamicPlotItem(pg.PlotItem):
             labelOpts={"position": 0.75, "movable": True, "fill": (200, 200, 200, 75)},
         )
         self.addItem(self.vline)
+
+        # Dragging the cursor emits many position changes, update the label at ~30 Hz
+        self._cursor_timer = QtCore.QTimer(self)
+        self._cursor_timer.setSingleShot(True)
+        self._cursor_timer.setInterval(33)
+        self._cursor_timer.timeout.connect(self._refresh_cursor_label)
         self.vline.sigPositionChanged.connect(self.update_cursor_label)
+        # The label is not updated while hidden, update it when shown again
+        self.vline.visibleChanged.connect(self.update_cursor_label)
 
         if xformat is None:
             if hasattr(self.plot_cls, "format_x"):
@@ -185,11 +311,20 @@ class DynamicPlotItem(pg.PlotItem):
 
     @QtCore.Slot()
     def update_cursor_label(self):
+        if not self.vline.isVisibleTo(self):
+            # Only skip when hidden by toggle_cursor, not when the plot itself is hidden
+            return
+        if not self._cursor_timer.isActive():
+            self._cursor_timer.start()
+
+    @QtCore.Slot()
+    def _refresh_cursor_label(self):
         xval = self.vline.value()
-        label = (
+        parts: list[str] = [
             f'<span style="color: #FFF; font-weight: 600;">{self.xformat(xval)}</span>'
-        )
-        old_x = None
+        ]
+        # Curves usually share the same x values, so look up each version only once
+        indices: dict[int, int] = {}
         for plot, enabled, entry, color in zip(
             self.plots,
             self.legendtable.enabled,
@@ -197,16 +332,36 @@ class DynamicPlotItem(pg.PlotItem):
             self.legendtable.colors,
             strict=True,
         ):
-            if plot.xData is None:
+            if not enabled or plot.xData is None:
                 continue
-            if old_x is None or not np.allclose(old_x, plot.xData):
-                old_x = plot.xData
-                idx = (np.abs(plot.xData - xval)).argmin()
+            x_version = self._x_versions.get(plot)
+            idx = indices.get(x_version)
+            if idx is None:
+                idx = self._nearest_plot_index(plot, xval)
+                if x_version is not None:
+                    indices[x_version] = idx
             yval = plot.yData[idx]
-            if enabled:
-                label += f'<br><span style="color: {color.name()}; font-weight: 600;">{entry}</span>'
-                label += f'<span style="color: #FFF;"> {self.yformat(yval)}</span>'
-        self.vline.label.setHtml(label)
+            color_name = self._color_names.get(plot)
+            if color_name is None:
+                color_name = color.name()
+            parts.append(
+                f'<br><span style="color: {color_name}; font-weight: 600;">{entry}</span>'
+                f'<span style="color: #FFF;"> {self.yformat(yval)}</span>'
+            )
+        self.vline.label.setHtml("".join(parts))
+
+    def _nearest_plot_index(self, plot: pg.PlotDataItem, xval: float) -> int:
+        """Return the index of the point of `plot` with x closest to `xval`."""
+        if plot not in self._x_versions:
+            # Data was not set through this item, so it cannot be tracked
+            return _nearest_index(plot.xData, xval)
+        x_sorted = self._x_sorted.get(plot)
+        if x_sorted is None:
+            x_sorted = self._x_sorted[plot] = _is_sorted(plot.xData)
+        if x_sorted:
+            return _nearest_index(plot.xData, xval, True)
+        self._scratch = _scratch_buffer(plot.xData, self._scratch)
+        return _nearest_index(plot.xData, xval, False, self._scratch)
 
     @QtCore.Slot()
     def toggle_snap(self):
@@ -223,7 +378,13 @@ class DynamicPlotItem(pg.PlotItem):
                 self.addItem(self.plots[-1])
         else:
             for _ in range(abs(diff)):
-                self.removeItem(self.plots.pop(-1))
+                p = self.plots.pop(-1)
+                self._pending_data.pop(p, None)
+                self._x_versions.pop(p, None)
+                self._x_sorted.pop(p, None)
+                self._pen_keys.pop(p, None)
+                self._color_names.pop(p, None)
+                self.removeItem(p)
 
     def set_labels(self, labels: Sequence[str]):
         self.legendtable.set_items(labels)
@@ -234,12 +395,20 @@ class DynamicPlotItem(pg.PlotItem):
 
     @QtCore.Slot(int, bool)
     def update_visibility(self, index: int, visible: bool):
-        self.plots[index].setVisible(visible)
-        self.plots[index].informViewBoundsChanged()
+        plot = self.plots[index]
+        if visible:
+            pending = self._pending_data.pop(plot, None)
+            if pending is not None:
+                x, y, x_version, x_sorted, kwargs = pending
+                plot.setData(x, y, **kwargs)
+                self._set_x_info(plot, x_version, x_sorted)
+                self._apply_pen(index)
+        plot.setVisible(visible)
+        plot.informViewBoundsChanged()
 
     @QtCore.Slot(int, object)
     def update_color(self, index: int, color: QtGui.QColor):
-        self.plots[index].setPen(color=color, **self.pen_kw)
+        self._apply_pen(index)
 
     def set_enabled(self, index: int, value: bool):
         self.legendtable.set_enabled(index, value)
@@ -247,25 +416,74 @@ class DynamicPlotItem(pg.PlotItem):
     def set_color(self, index: int, color: QtGui.QColor):
         self.legendtable.set_color(index, color)
 
+    def _pen_kw_for(self, label: str) -> dict:
+        return self.pen_kw
+
+    def _apply_pen(self, index: int):
+        """Set the pen of a curve, skipping the update if it has not changed."""
+        plot = self.plots[index]
+        color: QtGui.QColor = self.legendtable.colors[index]
+        pen_kw = self._pen_kw_for(self.legendtable.entries[index])
+        # Compare the contents, since the keyword arguments may be modified in place
+        key = (color.rgba(), tuple(pen_kw.items()))
+        if self._pen_keys.get(plot) != key:
+            plot.setPen(color=color, **pen_kw)
+            self._pen_keys[plot] = key
+            self._color_names[plot] = color.name()
+
     def set_data(self, index: int, x: Sequence[float], y: Sequence[float], **kwargs):
-        self.plots[index].setVisible(self.legendtable.enabled[index])
-        self.plots[index].setData(x, y, **kwargs)
-        self.plots[index].setPen(color=self.legendtable.colors[index], **self.pen_kw)
+        self._set_plot_data(
+            index,
+            np.asarray(x, dtype=np.float64),
+            np.asarray(y, dtype=np.float64),
+            next(self._x_counter),
+            None,
+            kwargs,
+        )
+
+    def _set_plot_data(
+        self,
+        index: int,
+        x: np.ndarray,
+        y: np.ndarray,
+        x_version: int,
+        x_sorted: bool | None,
+        kwargs: dict,
+    ):
+        plot = self.plots[index]
+        enabled: bool = self.legendtable.enabled[index]
+        plot.setVisible(enabled)
+        if not enabled:
+            # Hidden curves are not updated until they are enabled again
+            self._pending_data[plot] = (x, y, x_version, x_sorted, kwargs)
+            return
+        self._pending_data.pop(plot, None)
+        plot.setData(x, y, **kwargs)
+        self._set_x_info(plot, x_version, x_sorted)
+        self._apply_pen(index)
+
+    def _set_x_info(self, plot: pg.PlotDataItem, x_version: int, x_sorted: bool | None):
+        self._x_versions[plot] = x_version
+        if x_sorted is None:
+            # Checked when the cursor label needs it
+            self._x_sorted.pop(plot, None)
+        else:
+            self._x_sorted[plot] = x_sorted
 
     def set_datalist(
         self, x: Sequence[float], ylist: Sequence[Sequence[float]], **kwargs
     ):
-        for plot, y, color, enabled in zip(
-            self.plots,
-            ylist,
-            self.legendtable.colors,
-            self.legendtable.enabled,
-            strict=True,
-        ):
-            plot.setVisible(enabled)
-            plot.setData(x, y, **kwargs)
-            plot.setPen(color=color, **self.pen_kw)
-        self.vline.setBounds((min(x), max(x)))
+        x, ylist = _as_float_arrays(x, ylist)
+        # Checked once for all curves, also used for the cursor bounds
+        x_sorted: bool = _is_sorted(x)
+        x_version: int = next(self._x_counter)
+        for index, (_, y) in enumerate(zip(self.plots, ylist, strict=True)):
+            self._set_plot_data(index, x, y, x_version, x_sorted, kwargs)
+        if x_sorted:
+            # Timestamps are usually sorted, so the bounds are at the ends
+            self.vline.setBounds((float(x[0]), float(x[-1])))
+        else:
+            self.vline.setBounds((float(x.min()), float(x.max())))
 
     def set_datadict(
         self, x: Sequence[float], ydict: dict[str, Sequence[float]], **kwargs
@@ -290,6 +508,8 @@ class DynamicPlotItemTwiny(DynamicPlotItem):
 
         # Add another viewbox
         self.vbs = [self.vb, pg.ViewBox()]
+        # The viewbox each curve was added to, to avoid walking the item hierarchy
+        self._plot_vbs: dict[pg.PlotDataItem, pg.ViewBox] = {}
 
         if twiny_labels is None:
             twiny_labels = []
@@ -320,12 +540,13 @@ class DynamicPlotItemTwiny(DynamicPlotItem):
             index = 0
         self.getAxis(("left", "right")[index]).setLogMode(value)
         for plot in self.plots:
-            if plot.getViewBox() == self.vbs[index]:
+            if self._plot_vbs.get(plot) is self.vbs[index]:
                 plot.setLogMode(self.getAxis("bottom").logMode, value)
         self.vbs[index].enableAutoRange(y=True)
 
     def set_twiny_labels(self, twiny_labels: Iterable[str]):
-        self.twiny_labels = twiny_labels
+        # Labels are tested for membership for every curve on every update
+        self.twiny_labels: frozenset[str] = frozenset(twiny_labels)
         self.set_ncurves(len(self.plots))
 
     def set_ncurves(self, ncurves: int):
@@ -336,45 +557,26 @@ class DynamicPlotItemTwiny(DynamicPlotItem):
         elif diff < 0:
             for _ in range(abs(diff)):
                 p = self.plots.pop(-1)
-                p.getViewBox().removeItem(p)
-
+                self._pending_data.pop(p, None)
+                self._x_versions.pop(p, None)
+                self._x_sorted.pop(p, None)
+                self._pen_keys.pop(p, None)
+                self._color_names.pop(p, None)
+                self._plot_vbs.pop(p).removeItem(p)
+
+        main_vb, twin_vb = self.vbs
         for p, label in zip(self.plots, self.legendtable.entries, strict=True):
-            if label in self.twiny_labels:
-                vb = self.vbs[1]
-            else:
-                vb = self.vbs[0]
-            if p.getViewBox() == vb:
+            vb = twin_vb if label in self.twiny_labels else main_vb
+            current_vb = self._plot_vbs.get(p)
+            if current_vb is vb:
                 continue
-            elif p.getViewBox() is not None:
-                p.getViewBox().removeItem(p)
+            elif current_vb is not None:
+                current_vb.removeItem(p)
                 p.forgetViewBox()
             vb.addItem(p)
+            self._plot_vbs[p] = vb
 
-    def set_data(self, index: int, x: Sequence[float], y: Sequence[float], **kwargs):
-        self.plots[index].setVisible(self.legendtable.enabled[index])
-        self.plots[index].setData(x, y, **kwargs)
-        if self.legendtable.entries[index] in self.twiny_labels:
-            pen_kw = self.pen_kw_twin
-        else:
-            pen_kw = self.pen_kw
-        self.plots[index].setPen(color=self.legendtable.colors[index], **pen_kw)
-
-    def set_datalist(
-        self, x: Sequence[float], ylist: Sequence[Sequence[float]], **kwargs
-    ):
-        for plot, y, color, enabled, label in zip(
-            self.plots,
-            ylist,
-            self.legendtable.colors,
-            self.legendtable.enabled,
-            self.legendtable.entries,
-            strict=True,
-        ):
-            plot.setVisible(enabled)
-            plot.setData(x, y, **kwargs)
-            if label in self.twiny_labels:
-                pen_kw = self.pen_kw_twin
-            else:
-                pen_kw = self.pen_kw
-            plot.setPen(color=color, **pen_kw)
-        self.vline.setBounds((min(x), max(x)))
+    def _pen_kw_for(self, label: str) -> dict:
+        if label in self.twiny_labels:
+            return self.pen_kw_twin
+        return self.pen_kw
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+plotting = pytest.importorskip("qt_extensions.plotting")
+
+
+@pytest.mark.parametrize(
+    ("x", "expected"),
+    [
+        (None, False),
+        (np.array([]), False),
+        (np.array([1.0]), True),
+        (np.array([0.0, 1.0, 1.0, 2.0]), True),
+        (np.array([0.0, 2.0, 1.0]), False),
+        (np.array([2.0, 1.0, 0.0]), False),
+    ],
+)
+def test_is_sorted(x, expected):
+    assert plotting._is_sorted(x) is expected
+
+
+@pytest.mark.parametrize(
+    "x",
+    [
+        np.array([0.0]),
+        np.array([0.0, 2.0]),
+        np.array([0.0, 1.0, 1.0, 3.0]),
+        np.array([0.0, 1.0, 1.0, 1.0, 2.0]),
+        np.linspace(-5.0, 5.0, 21),
+    ],
+)
+@pytest.mark.parametrize("value", [-10.0, -1.0, 0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 10.0])
+def test_nearest_index_sorted(x, value):
+    expected = int(np.argmin(np.abs(x - value)))
+    assert plotting._nearest_index(x, value, is_sorted=True) == expected
+
+
+@pytest.mark.parametrize("value", [-1.0, 0.0, 0.5, 1.0, 2.5, 4.0, 10.0])
+def test_nearest_index_unsorted(value):
+    x = np.array([3.0, 0.0, 2.0, 0.0, 1.0, 3.0])
+    expected = int(np.argmin(np.abs(x - value)))
+    assert plotting._nearest_index(x, value) == expected
+
+    out = np.empty_like(x)
+    assert plotting._nearest_index(x, value, out=out) == expected
+
+
+def test_nearest_index_random():
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.integers(0, 50, size=200).astype(np.float64))
+    out = np.empty_like(x)
+    for value in rng.uniform(-10.0, 60.0, size=100):
+        expected = int(np.argmin(np.abs(x - value)))
+        assert plotting._nearest_index(x, value, is_sorted=True) == expected
+        assert plotting._nearest_index(x, value, out=out) == expected
+
+
+def test_scratch_buffer():
+    x = np.arange(5, dtype=np.float64)
+    assert plotting._scratch_buffer(None, None) is None
+
+    buf = plotting._scratch_buffer(x, None)
+    assert buf.shape == x.shape
+    assert buf.dtype == np.float64
+    assert plotting._scratch_buffer(x, buf) is buf
+
+    resized = plotting._scratch_buffer(np.arange(3), buf)
+    assert resized is not buf
+    assert resized.shape == (3,)
@@ -0,0 +1,142 @@
+import os
+
+import numpy as np
+import pytest
+
+from sescontrol import utils
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls: list[float] = []
+    monkeypatch.setattr(utils.time, "sleep", calls.append)
+    return calls
+
+
+def test_backoff_sleep_grows_until_maximum(sleeps):
+    dt = 0.001
+    for _ in range(30):
+        dt = utils.backoff_sleep(dt)
+    assert dt == pytest.approx(0.1)
+    assert sleeps[0] == pytest.approx(0.001)
+    assert sleeps == sorted(sleeps)
+    assert max(sleeps) <= 0.1
+
+
+@pytest.mark.parametrize(("dt", "expected"), [(0.01, 0.015), (0.08, 0.1), (0.5, 0.1)])
+def test_backoff_sleep_bounds(sleeps, dt, expected):
+    assert utils.backoff_sleep(dt) == pytest.approx(expected)
+    assert sleeps == [dt]
+
+
+def test_backoff_sleep_custom_factor(sleeps):
+    assert utils.backoff_sleep(1.0, maximum=10.0, factor=3.0) == pytest.approx(3.0)
+
+
+def _write(path, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_restore_names_renames(tmp_path):
+    prefix = utils.TEMPFILE_PREFIX
+    _write(tmp_path / f"{prefix}scan0001.pxt", b"data")
+    _write(tmp_path / f"{prefix}scan0001_S00001.pxt", b"slice")
+    _write(tmp_path / f"{prefix}scan0001_motors.csv", b"a,b\r\n")
+    _write(tmp_path / f"{prefix}scan0001.txt", b"other extension")
+    _write(tmp_path / f"{prefix}other0001.pxt", b"other scan")
+
+    utils.restore_names([".pxt"], str(tmp_path), "scan0001")
+
+    assert sorted(os.listdir(tmp_path)) == [
+        f"{prefix}other0001.pxt",
+        f"{prefix}scan0001.txt",
+        "scan0001.pxt",
+        "scan0001_S00001.pxt",
+        "scan0001_motors.csv",
+    ]
+    assert _read(tmp_path / "scan0001.pxt") == b"data"
+    assert _read(tmp_path / "scan0001_S00001.pxt") == b"slice"
+
+
+def test_restore_names_single_file(tmp_path):
+    _write(tmp_path / f"{utils.TEMPFILE_PREFIX}scan0001.pxt", b"data")
+
+    utils.restore_names([".pxt"], str(tmp_path), "scan0001")
+
+    assert os.listdir(tmp_path) == ["scan0001.pxt"]
+
+
+def test_restore_names_merges_csv(tmp_path):
+    prefix = utils.TEMPFILE_PREFIX
+    _write(tmp_path / "scan0001_motors.csv", b"a,b\r\n1,2\r\n")
+    _write(tmp_path / f"{prefix}scan0001_motors.csv", b"3,4\r\n")
+
+    utils.restore_names([".pxt"], str(tmp_path), "scan0001")
+
+    assert os.listdir(tmp_path) == ["scan0001_motors.csv"]
+    assert _read(tmp_path / "scan0001_motors.csv") == b"a,b\r\n1,2\r\n3,4\r\n"
+
+
+def test_restore_names_keeps_existing_data(tmp_path):
+    prefix = utils.TEMPFILE_PREFIX
+    _write(tmp_path / "scan0001.pxt", b"old")
+    _write(tmp_path / f"{prefix}scan0001.pxt", b"new")
+    _write(tmp_path / f"{prefix}scan0001_S00001.pxt", b"slice")
+
+    utils.restore_names([".pxt"], str(tmp_path), "scan0001")
+
+    assert sorted(os.listdir(tmp_path)) == [
+        f"{prefix}scan0001.pxt",
+        "scan0001.pxt",
+        "scan0001_S00001.pxt",
+    ]
+    assert _read(tmp_path / "scan0001.pxt") == b"old"
+    assert _read(tmp_path / f"{prefix}scan0001.pxt") == b"new"
+
+
+def test_restore_name_retries_and_merges(tmp_path, monkeypatch, sleeps):
+    # On Windows, os.rename fails if the file is in use or the target exists
+    errors = [PermissionError, PermissionError, FileExistsError]
+
+    def rename(src, dst):
+        raise errors.pop(0)
+
+    monkeypatch.setattr(utils.os, "rename", rename)
+    src = tmp_path / f"{utils.TEMPFILE_PREFIX}scan0001_motors.csv"
+    dst = tmp_path / "scan0001_motors.csv"
+    _write(src, b"3,4\r\n")
+    _write(dst, b"1,2\r\n")
+
+    utils._restore_name(str(src), str(dst))
+
+    assert not errors
+    assert len(sleeps) == 2
+    assert os.listdir(tmp_path) == ["scan0001_motors.csv"]
+    assert _read(dst) == b"1,2\r\n3,4\r\n"
+
+
+@pytest.mark.parametrize("size", [1, 2, 10, 1000])
+def test_welford_update(size):
+    values = np.random.default_rng(size).normal(loc=5.0, scale=2.0, size=size)
+
+    stats = (0, 0.0, 0.0)
+    for value in values:
+        stats = utils.welford_update(stats, float(value))
+
+    n, mean, m2 = stats
+    assert n == size
+    assert mean == pytest.approx(values.mean())
+    assert m2 / n == pytest.approx(values.var())
+
+
+def test_welford_update_constant():
+    stats = (0, 0.0, 0.0)
+    for _ in range(5):
+        stats = utils.welford_update(stats, 1.5)
+    assert stats == (5, 1.5, 0.0)